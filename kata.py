@@ -8,28 +8,35 @@ try:
 except AssertionError:
     exit("Kata requires Python 3.12 or above")
 
-from http.client import HTTPConnection, HTTPSConnection
+from functools import cache
 from json import dumps, loads
-from os import chmod, environ, getgid, getuid, listdir, makedirs, remove, stat
+from os import O_APPEND, O_CREAT, O_TRUNC, O_WRONLY, chdir, chmod, close, environ, execvp, fchmod, fstat, getgid, getuid, makedirs, remove, replace, scandir, stat
+from os import open as os_open
+from os import write as os_write
 from os.path import abspath, dirname, exists, join, realpath
-from re import sub
+from re import compile as re_compile
 from shutil import copyfile, rmtree, which
 from stat import S_IRUSR, S_IWUSR, S_IXUSR
 from subprocess import STDOUT, call, check_output, run
 from sys import argv, stderr, stdin, stdout, version_info
-from tempfile import NamedTemporaryFile
-from traceback import format_exc
 
 from click import UNPROCESSED, argument
 from click import echo as click_echo
 from click import group, option
-from yaml import safe_dump, safe_load
+
+try:
+    # Optional: a much faster JSON codec for large Caddy configurations
+    from orjson import OPT_INDENT_2
+    from orjson import dumps as orjson_dumps
+    from orjson import loads as orjson_loads
+except ImportError:
+    orjson_dumps = orjson_loads = OPT_INDENT_2 = None
 
 # === Make sure we can access all system and user binaries ===
 
 if 'sbin' not in environ['PATH']:
     environ['PATH'] = "/usr/local/sbin:/usr/sbin:/sbin:" + environ['PATH']
-if '.local' not in environ['PATH']:
+if environ['HOME'] + "/.local/bin" not in environ['PATH'].split(':'):
     environ['PATH'] = environ['HOME'] + "/.local/bin:" + environ['PATH']
 
 # === Globals - all tweakable settings are here ===
@@ -49,8 +56,14 @@ PGID = getgid()
 DOCKER_COMPOSE = ".docker-compose.yaml"
 KATA_COMPOSE = "kata-compose.yaml"
 KATA_MODE_FILE = ".kata-mode"  # stores 'swarm' or 'compose' per app
+DOCKER_PROBE_TIMEOUT = 10  # seconds to wait on docker capability probes before falling back
+CADDY_ADMIN_SOCKET = environ.get('CADDY_ADMIN_SOCKET', '/run/caddy/admin.sock')  # used instead of localhost:2019 when present
 ROOT_FOLDERS = ['APP_ROOT', 'DATA_ROOT', 'ENV_ROOT', 'CONFIG_ROOT', 'GIT_ROOT', 'LOG_ROOT']
-if KATA_BIN not in environ['PATH']:
+ROOT_PATHS = tuple((name, globals()[name]) for name in ROOT_FOLDERS)  # resolved once at import
+INVALID_APP_CHARS = re_compile(r'[^a-zA-Z0-9_-]')
+ENV_VAR_PATTERN = re_compile(r'\$(\w+|\{([^}]*)\})')
+ENV_VAR_PATTERN_UNESCAPED = re_compile(r'(?<!\\)\$(\w+|\{([^}]*)\})')  # skips \$VAR
+if KATA_BIN not in environ['PATH'].split(':'):
     environ['PATH'] = KATA_BIN + ":" + environ['PATH']
 
 # === Make sure we can access kata user-installed binaries === #
@@ -97,6 +110,15 @@ RUNTIME_IMAGES = {
     'kata/nodejs': NODEJS_DOCKERFILE
 }
 
+RUNTIME_MANIFESTS = {  # files whose contents decide whether a runtime's dependencies need reinstalling
+    'python': ['requirements.txt'],
+    'nodejs': ['package.json', 'package-lock.json']
+}
+
+POST_RECEIVE_HOOK = """#!/usr/bin/env bash
+set -e; set -o pipefail;
+cat | KATA_ROOT="{KATA_ROOT:s}" {KATA_SCRIPT:s} git-hook {app:s}"""
+
 # === Utility functions ===
 
 def echo(message, fg=None, nl=True, err=False) -> None:
@@ -107,13 +129,8 @@ def echo(message, fg=None, nl=True, err=False) -> None:
 def base_env(app, env=None) -> dict:
     """Get the environment variables for an app"""
     base = {'PGID': str(PGID), 'PUID': str(PUID)}
-    for key in ROOT_FOLDERS:
-        try:
-            path_value = globals()[key]
-            base[key] = join(path_value, app)
-        except KeyError:
-            echo(f"Error: {key} not found in global variables", fg='red')
-            exit(1)
+    for key, root in ROOT_PATHS:
+        base[key] = join(root, app)
     # If env is provided, update the base environment with it
     if env is not None:
         base.update(env)
@@ -121,29 +138,66 @@ def base_env(app, env=None) -> dict:
     # finally, an ENV or .env file in the config directory overrides things
     # TODO: validate if this still makes sense
     for name in ['ENV', '.env']:
-        env_file = join(CONFIG_ROOT, app, name)
-        if exists(env_file):
-            with open(env_file, 'r', encoding='utf-8') as f:
-                base.update(dict(line.strip().split('=', 1) for line in f if '=' in line))
+        try:
+            base.update(load_cached(join(CONFIG_ROOT, app, name), read_env_file))
+        except FileNotFoundError:
+            pass
     return base
 
 
+def read_env_file(filename) -> dict:
+    """Parse KEY=VALUE lines from an env file, skipping comments"""
+    result = {}
+    with open(filename, 'r', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    for line in lines:
+        # cheap rejects before partitioning: blank lines and comments
+        if not line or line[0] == '#':
+            continue
+        key, sep, value = line.strip().partition('=')
+        if sep and not key.startswith('#'):
+            result[key] = value
+    return result
+
+
+@cache
+def tool_path(name) -> str:
+    """Resolve a binary on PATH once per process, falling back to its bare name"""
+    return which(name) or name
+
+
+def json_encode(obj, indent=False) -> bytes:
+    """Serialize to UTF-8 JSON, optionally indented by two spaces, using orjson when available"""
+    if orjson_dumps:
+        return orjson_dumps(obj, option=OPT_INDENT_2 if indent else None)
+    return dumps(obj, indent=2 if indent else None).encode('utf-8')
+
+
+def json_decode(data):
+    """Parse JSON from bytes or str, using orjson when available"""
+    if orjson_loads:
+        return orjson_loads(data)
+    return loads(data)
+
+
 def expandvars(buffer, env, default=None, skip_escaped=False):
     """expand shell-style environment variables in a buffer"""
     def replace_var(match):
         return env.get(match.group(2) or match.group(1), match.group(0) if default is None else default)
-    pattern = (r'(?<!\\)' if skip_escaped else '') + r'\$(\w+|\{([^}]*)\})'
-    return sub(pattern, replace_var, buffer)
+    pattern = ENV_VAR_PATTERN_UNESCAPED if skip_escaped else ENV_VAR_PATTERN
+    return pattern.sub(replace_var, buffer)
 
 
 def load_yaml(filename, env=None):
-    if not exists(filename):
+    from yaml import safe_load
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            content = f.read()
+    except FileNotFoundError:
         echo(f"File not found: {filename}", fg='red')
         return None
     if env is None:
         env = environ.copy()
-    with open(filename, 'r', encoding='utf-8') as f:
-        content = f.read()
     content = expandvars(content, env)
     try:
         return safe_load(content)
@@ -151,24 +205,48 @@ def load_yaml(filename, env=None):
         echo(f"Error parsing YAML: {str(e)}", fg='red')
         return None
 
+
+def read_yaml(filename):
+    """Parse a YAML file as-is, without variable expansion"""
+    from yaml import safe_load
+    with open(filename, 'r', encoding='utf-8') as f:
+        return safe_load(f)
+
+
+file_cache = {}  # filename -> ((st_mtime_ns, st_size), parsed value)
+
+
+def load_cached(filename, loader):
+    """Return loader(filename), reusing the last result while the file is unchanged"""
+    st = stat(filename)
+    key = (st.st_mtime_ns, st.st_size)
+    cached = file_cache.get(filename)
+    if cached and cached[0] == key:
+        return cached[1]
+    value = loader(filename)
+    file_cache[filename] = (key, value)
+    return value
+
 # === SSH and git Helpers ===
 
 def setup_authorized_keys(ssh_fingerprint, script_path, pubkey):
     """Sets up an authorized_keys file to redirect SSH commands"""
     authorized_keys = join(environ['HOME'], '.ssh', 'authorized_keys')
-    if not exists(dirname(authorized_keys)):
-        makedirs(dirname(authorized_keys))
+    makedirs(dirname(authorized_keys), mode=S_IRUSR | S_IWUSR | S_IXUSR, exist_ok=True)
     # Restrict features and force all SSH commands to go through our script
-    with open(authorized_keys, 'a', encoding='utf-8') as h:
-        h.write(f"""command="FINGERPRINT={ssh_fingerprint:s} NAME=default {script_path:s} $SSH_ORIGINAL_COMMAND",no-agent-forwarding,no-user-rc,no-X11-forwarding,no-port-forwarding {pubkey:s}\n""")
-    chmod(dirname(authorized_keys), S_IRUSR | S_IWUSR | S_IXUSR)
-    chmod(authorized_keys, S_IRUSR | S_IWUSR)
+    line = f"""command="FINGERPRINT={ssh_fingerprint:s} NAME=default {script_path:s} $SSH_ORIGINAL_COMMAND",no-agent-forwarding,no-user-rc,no-X11-forwarding,no-port-forwarding {pubkey:s}\n"""
+    # Permissions are set on creation, so the file is never readable by others
+    fd = os_open(authorized_keys, O_WRONLY | O_CREAT | O_APPEND, S_IRUSR | S_IWUSR)
+    try:
+        os_write(fd, line.encode('utf-8'))
+    finally:
+        close(fd)
 
 # === Docker Helpers ===
 
 def docker_check_image_exists(image_name):
     """Check if a Docker image exists locally"""
-    output = check_output(['docker', 'image', 'list', '--format', '{{.Repository}}:{{.Tag}}'], stderr=STDOUT, universal_newlines=True)
+    output = check_output([tool_path('docker'), 'image', 'list', '--format', '{{.Repository}}:{{.Tag}}'], stderr=STDOUT, universal_newlines=True)
     if image_name in output:
         return True
     return False
@@ -176,11 +254,12 @@ def docker_check_image_exists(image_name):
 
 def docker_create_runtime_image(image_name, dockerfile_content):
     """Create a Docker image from a Dockerfile content"""
+    from tempfile import NamedTemporaryFile
     try:
         with NamedTemporaryFile(delete=False, mode='w', suffix='.Dockerfile') as dockerfile:
             dockerfile.write(dockerfile_content)
             dockerfile_path = dockerfile.name
-        output = check_output(['docker', 'build', '-t', image_name, '-f', dockerfile_path, '.'], stderr=STDOUT, universal_newlines=True)
+        output = check_output([tool_path('docker'), 'build', '-t', image_name, '-f', dockerfile_path, '.'], stderr=STDOUT, universal_newlines=True)
         echo(f"Created '{image_name}' successfully.", fg='green')
         return True
     except Exception as e:
@@ -192,9 +271,11 @@ def docker_create_runtime_image(image_name, dockerfile_content):
 
 def docker_handle_runtime_environment(app_name, runtime, destroy=False, env=None):
     image = f"kata/{runtime}"
+    rebuilt = False
     if not docker_check_image_exists(image) and not destroy:
         if not docker_create_runtime_image(image, RUNTIME_IMAGES[image]):
             exit(1)
+        rebuilt = True
     volumes = [
         "-v", f"{join(APP_ROOT, app_name)}:/app",
         "-v", f"{join(CONFIG_ROOT, app_name)}:/config",
@@ -203,25 +284,53 @@ def docker_handle_runtime_environment(app_name, runtime, destroy=False, env=None
     ]
     if destroy:
         cmds = {
-            'python': [['chown', '-hR', f'{PUID}:{PGID}', '/data'], 
-                       ['chown', '-hR', f'{PUID}:{PGID}', '/app'], 
-                       ['chown', '-hR', f'{PUID}:{PGID}', '/venv'], 
-                       ['chown', '-hR', f'{PUID}:{PGID}', '/config']],
-            'nodejs': [['chown', '-hR', f'{PUID}:{PGID}', '/data'], 
-                       ['chown', '-hR', f'{PUID}:{PGID}', '/app'], 
-                       ['chown', '-hR', f'{PUID}:{PGID}', '/venv'], 
-                       ['chown', '-hR', f'{PUID}:{PGID}', '/config']]
+            'python': [['chown', '-hR', f'{PUID}:{PGID}', '/data', '/app', '/venv', '/config']],
+            'nodejs': [['chown', '-hR', f'{PUID}:{PGID}', '/data', '/app', '/venv', '/config']]
         }
     else:
+        # Create the mounts ourselves so docker does not create them owned by root
+        for root in (APP_ROOT, CONFIG_ROOT, DATA_ROOT, ENV_ROOT):
+            makedirs(join(root, app_name), exist_ok=True)
+        # Skip the install when the dependency manifests match the last successful one,
+        # unless the image was just (re)built and the venv may come from an older interpreter
+        digest = runtime_digest(app_name, runtime)
+        stamp = join(ENV_ROOT, app_name, f".kata-{runtime}.sha256")
+        try:
+            with open(stamp, 'r', encoding='utf-8') as f:
+                if f.read() == digest and not rebuilt:
+                    echo(f"-----> '{runtime}' dependencies unchanged, skipping install", fg='green')
+                    return
+            # Drop the stamp before installing, so only a run that completes writes it back
+            remove(stamp)
+        except FileNotFoundError:
+            pass
         cmds = {
             'python': [['python3', '-m', 'venv', '/venv'],
                        ['pip3', 'install', '-r', '/app/requirements.txt']],
             'nodejs': [['npm', 'install' ]]
         }
+    failed = False
     for cmd in cmds[runtime]:
         echo(f"Running cleanup command: {' '.join(cmd)}", fg='green')
-        call(['docker', 'run', '--rm'] + volumes + ['-i', f'kata/{runtime}'] + cmd,
-         cwd=join(APP_ROOT, app_name), env=env, stdout=stdout, stderr=stderr, universal_newlines=True)
+        if call([tool_path('docker'), 'run', '--rm'] + volumes + ['-i', f'kata/{runtime}'] + cmd,
+                cwd=join(APP_ROOT, app_name), env=env, stdout=stdout, stderr=stderr, universal_newlines=True):
+            failed = True
+    if not destroy and not failed:
+        with open(stamp, 'w', encoding='utf-8') as f:
+            f.write(digest)
+
+
+def runtime_digest(app_name, runtime) -> str:
+    """Hash the dependency manifests a runtime installs from"""
+    from hashlib import sha256
+    digest = sha256(runtime.encode('utf-8'))
+    for name in RUNTIME_MANIFESTS[runtime]:
+        try:
+            with open(join(APP_ROOT, app_name, name), 'rb') as f:
+                digest.update(name.encode('utf-8') + b'\0' + f.read())
+        except FileNotFoundError:
+            pass
+    return digest.hexdigest()
 
 # === App Management ===
 
@@ -235,10 +344,11 @@ def exit_if_invalid(app, deployed=False):
     return app
 
 
+@cache
 def sanitize_app_name(app) -> str:
     """Sanitize the app name"""
     if app:
-        return sub(r'[^a-zA-Z0-9_-]', '', app)
+        return INVALID_APP_CHARS.sub('', app)
     return app
 
 
@@ -260,6 +370,7 @@ def parse_compose(app_name, filename) -> tuple:
     if not "services" in data:
         echo(f"Warning: no 'services' section found in {filename}", fg='yellow')
     services = data.get("services", {})
+    prepared = set()  # runtimes already set up for this app
 
     for service_name, service in services.items():
         echo(f"-----> Preparing service '{service_name}'", fg='green')
@@ -268,7 +379,10 @@ def parse_compose(app_name, filename) -> tuple:
                 service["image"] = f"kata/{service['runtime']}"
                 echo(f"=====> '{service_name}' will use runtime '{service['runtime']}'", fg='green')
                 if service["image"] in RUNTIME_IMAGES:
-                    docker_handle_runtime_environment(app_name, service["runtime"], env=env)
+                    # services sharing a runtime share the app's /venv, so prepare it only once
+                    if service["runtime"] not in prepared:
+                        docker_handle_runtime_environment(app_name, service["runtime"], env=env)
+                        prepared.add(service["runtime"])
                 else:
                     echo(f"Error: runtime '{service['runtime']}' not supported", fg='red')
                     exit(1)
@@ -290,12 +404,9 @@ def parse_compose(app_name, filename) -> tuple:
             converted = {}
             for item in service["environment"]:
                 if isinstance(item, str):
-                    if '=' in item:
-                        k, v = item.split('=', 1)
-                        converted[str(k)] = str(v)
-                    else:
-                        # No value provided; default to empty string
-                        converted[str(item)] = ""
+                    # No value provided ("K" with no "="); default to empty string
+                    k, _, v = item.partition('=')
+                    converted[k] = v
                 elif isinstance(item, dict):
                     for k, v in item.items():
                         converted[str(k)] = str(v)
@@ -342,10 +453,12 @@ def parse_compose(app_name, filename) -> tuple:
 
 # === Orchestrator helpers ===
 
+@cache
 def docker_supports_swarm() -> bool:
     try:
         # docker info exits 0 even if not in swarm; we'll check Swarm: inactive in output
-        out = check_output(['docker', 'info', '--format', '{{.Swarm.LocalNodeState}}'], universal_newlines=True).strip()
+        out = check_output([tool_path('docker'), 'info', '--format', '{{.Swarm.LocalNodeState}}'], universal_newlines=True,
+                           timeout=DOCKER_PROBE_TIMEOUT).strip()
         return out.lower() == 'active'
     except Exception:
         return False
@@ -355,22 +468,19 @@ def get_app_mode(app: str) -> str:
        Allows override via x-kata-mode in kata-compose.yaml or .kata-mode file saved on deploy."""
     app_path = join(APP_ROOT, app)
     # persisted override file
-    mf = join(app_path, KATA_MODE_FILE)
-    if exists(mf):
-        try:
-            return open(mf, 'r', encoding='utf-8').read().strip()
-        except Exception:
-            pass
+    try:
+        with open(join(app_path, KATA_MODE_FILE), 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except Exception:
+        pass
     # compose file override
-    compose_path = join(app_path, KATA_COMPOSE)
-    if exists(compose_path):
-        try:
-            cfg = safe_load(open(compose_path, 'r', encoding='utf-8'))
-            mode = cfg.get('x-kata-mode')
-            if mode in ('swarm', 'compose'):
-                return mode
-        except Exception:
-            pass
+    try:
+        cfg = load_cached(join(app_path, KATA_COMPOSE), read_yaml)
+        mode = cfg.get('x-kata-mode')
+        if mode in ('swarm', 'compose'):
+            return mode
+    except Exception:
+        pass
     # default based on swarm
     return 'swarm' if docker_supports_swarm() else 'compose'
 
@@ -382,20 +492,23 @@ def set_app_mode(app: str, mode: str):
     except Exception:
         pass
 
+@cache
 def get_compose_cmd() -> list:
     """Return the base compose command: ['docker','compose'] if available, else ['docker-compose']."""
     # Prefer docker compose (V2)
     try:
-        out = check_output(['docker', 'compose', 'version'], stderr=STDOUT, universal_newlines=True)
+        out = check_output([tool_path('docker'), 'compose', 'version'], stderr=STDOUT, universal_newlines=True,
+                           timeout=DOCKER_PROBE_TIMEOUT)
         if out:
-            return ['docker', 'compose']
+            return [tool_path('docker'), 'compose']
     except Exception:
         pass
     # Fallback to docker-compose (V1)
-    if which('docker-compose'):
-        return ['docker-compose']
+    compose_bin = which('docker-compose')
+    if compose_bin:
+        return [compose_bin]
     # Last resort: assume docker compose exists
-    return ['docker', 'compose']
+    return [tool_path('docker'), 'compose']
 
 def require_swarm_or_warn() -> bool:
     """Ensure Docker Swarm is active; print a helpful error if not."""
@@ -407,6 +520,50 @@ def require_swarm_or_warn() -> bool:
 
 # Caddy API Management
 
+caddy_connection = None  # kept open across admin API calls
+
+
+def caddy_connect():
+    """Open a connection to the Caddy admin API, preferring its Unix socket"""
+    from http.client import HTTPConnection
+    from socket import AF_UNIX, SOCK_STREAM, socket
+    if not exists(CADDY_ADMIN_SOCKET):
+        return HTTPConnection('localhost', 2019, timeout=5)
+
+    class UnixHTTPConnection(HTTPConnection):
+        def connect(self):
+            self.sock = socket(AF_UNIX, SOCK_STREAM)
+            self.sock.settimeout(self.timeout)
+            self.sock.connect(CADDY_ADMIN_SOCKET)
+
+        def putrequest(self, method, url, skip_host=False, skip_accept_encoding=False):
+            # Caddy only accepts an empty Host header on its Unix socket
+            super().putrequest(method, url, skip_host=True, skip_accept_encoding=skip_accept_encoding)
+            self.putheader('Host', '')
+
+    return UnixHTTPConnection('localhost', timeout=5)
+
+
+def caddy_request(method, path, body=None) -> tuple:
+    """Send a request to the Caddy admin API, returning (status, reason, body)"""
+    from http.client import HTTPException
+    global caddy_connection
+    headers = {'Content-Type': 'application/json'} if body is not None else {}
+    # Reuse the keep-alive connection, reconnecting once if Caddy dropped it
+    for attempt in range(2):
+        if caddy_connection is None:
+            caddy_connection = caddy_connect()
+        try:
+            caddy_connection.request(method, path, body=body, headers=headers)
+            resp = caddy_connection.getresponse()
+            return resp.status, resp.reason, resp.read()
+        except (HTTPException, OSError):
+            caddy_connection.close()
+            caddy_connection = None
+            if attempt:
+                raise
+
+
 def validate_caddy_json(config):
     if not isinstance(config, dict):
         return False, "Configuration must be a JSON object"
@@ -436,15 +593,11 @@ def caddy_config(app, config_json):
         echo(f"Error in caddy configuration: {error_message}", fg='red')
         return False
     try:
-        config_data = dumps(config_json).encode('utf-8')
         echo(f"-----> Configuring Caddy for app '{app}'", fg='green')
         # First, get the current complete Caddy configuration
         try:
-            c = HTTPConnection('localhost', 2019, timeout=1)
-            c.request('GET', '/config/')
-            get_resp = c.getresponse()
-            current_config = loads(get_resp.read().decode('utf-8'))
-            c.close()
+            _, _, body = caddy_request('GET', '/config/')
+            current_config = json_decode(body)
 
             # Ensure the structure exists
             if 'apps' not in current_config:
@@ -454,26 +607,28 @@ def caddy_config(app, config_json):
             if 'servers' not in current_config['apps']['http']:
                 current_config['apps']['http']['servers'] = {}
 
+            # Skip the reload when Caddy is already serving this exact config
+            if current_config['apps']['http']['servers'].get(app) == config_json:
+                echo(f"-----> Caddy configuration for app '{app}' is unchanged", fg='green')
+                return True
+
             # Update only our app's configuration, preserving everything else
             current_config['apps']['http']['servers'][app] = config_json
 
             # Convert to JSON and encode
-            config_data = dumps(current_config).encode('utf-8')
+            config_data = json_encode(current_config)
 
             # Update the full config
-            c = HTTPConnection('localhost', 2019, timeout=1)
-            c.request('POST', '/load', body=config_data, headers={'Content-Type': 'application/json'})
-            resp = c.getresponse()
-            body = resp.read().decode('utf-8', errors='replace')
+            status, reason, body = caddy_request('POST', '/load', config_data)
         except Exception as e:
             echo(f"Error preparing Caddy configuration: {e}", fg='red')
             return False
 
-        if resp.status in (200, 201, 204):
+        if status in (200, 201, 204):
             echo(f"-----> Successfully configured Caddy for app '{app}'", fg='green')
             return True
         else:
-            echo(f"Warning: Caddy API configuration failed: {resp.status} {resp.reason}\n{body}", fg='yellow')
+            echo(f"Warning: Caddy API configuration failed: {status} {reason}\n{body.decode('utf-8', errors='replace')}", fg='yellow')
             return False
 
     except Exception as e:
@@ -486,13 +641,9 @@ def caddy_config(app, config_json):
 def caddy_get(app=None):
     """Get Caddy configuration using the admin API"""
     try:
-        c = HTTPConnection('localhost', 2019, timeout=1)
-        api_path = "/config/"
-        c.request('GET', api_path)
-        resp = c.getresponse()
-        body = resp.read().decode('utf-8', errors='replace')
-        if resp.status == 200:
-            config = loads(body)
+        status, reason, body = caddy_request('GET', '/config/')
+        if status == 200:
+            config = json_decode(body)
             if app:
                 if 'apps' in config and 'http' in config['apps']:
                     if 'servers' in config['apps']['http'] and app in config['apps']['http']['servers']:
@@ -504,7 +655,7 @@ def caddy_get(app=None):
             else:
                 return config  # Return full config
         else:
-            echo(f"Error: Caddy API returned status {resp.status} - {resp.reason}", fg='red')
+            echo(f"Error: Caddy API returned status {status} - {reason}", fg='red')
             return None
     except Exception as e:
         echo(f"Error getting Caddy configuration: {e}", fg='red')
@@ -517,11 +668,8 @@ def caddy_remove(app):
         echo(f"-----> Removing Caddy configuration for app '{app}'", fg='yellow')
 
         # First, get the current complete Caddy configuration
-        c = HTTPConnection('localhost', 2019, timeout=1)
-        c.request('GET', '/config/')
-        resp = c.getresponse()
-        current_config = loads(resp.read().decode('utf-8'))
-        c.close()
+        _, _, body = caddy_request('GET', '/config/')
+        current_config = json_decode(body)
 
         # Check if the app exists in the configuration
         if ('apps' in current_config and 'http' in current_config['apps'] and
@@ -530,14 +678,10 @@ def caddy_remove(app):
             # Remove the app from the configuration, preserving everything else
             del current_config['apps']['http']['servers'][app]
 
-            config_data = dumps(current_config).encode('utf-8')
-            c = HTTPConnection('localhost', 2019, timeout=5)
-            c.request('POST', '/load', body=config_data,
-                      headers={'Content-Type': 'application/json'})
-            resp = c.getresponse()
-            resp.read()  # Consume the response body
+            config_data = json_encode(current_config)
+            status, _, _ = caddy_request('POST', '/load', config_data)
 
-            if resp.status in (200, 204):
+            if status in (200, 204):
                 echo(f"-----> Successfully removed Caddy configuration for app '{app}'", fg='green')
                 return True
             else:
@@ -556,6 +700,8 @@ def caddy_remove(app):
 
 def do_deploy(app, deltas={}, newrev=None):
     """Deploy an app by resetting the work directory"""
+    from tempfile import NamedTemporaryFile
+    from yaml import safe_dump
 
     app_path = join(APP_ROOT, app)
     compose_file = join(app_path, KATA_COMPOSE)
@@ -563,38 +709,57 @@ def do_deploy(app, deltas={}, newrev=None):
     env = {'GIT_WORK_DIR': app_path}
     if exists(app_path):
         echo(f"-----> Deploying app '{app}'", fg='green')
-        call('git fetch --quiet', cwd=app_path, env=env, shell=True)
+        call([tool_path('git'), 'fetch', '--quiet'], cwd=app_path, env=env)
         if newrev:
-            call(f'git reset --hard {newrev}', cwd=app_path, env=env, shell=True)
-        call('git submodule init', cwd=app_path, env=env, shell=True)
-        call('git submodule update', cwd=app_path, env=env, shell=True)
+            call([tool_path('git'), 'reset', '--hard', newrev], cwd=app_path, env=env)
+        call([tool_path('git'), 'submodule', 'update', '--init'], cwd=app_path, env=env)
         compose, caddy = parse_compose(app, compose_file)
         if not compose:
             echo(f"Error: could not parse {compose_file}", fg='red')
             return
-        with open(join(APP_ROOT, app, DOCKER_COMPOSE), "w", encoding='utf-8') as f:
-            f.write(safe_dump(compose))
+        compose_path = join(app_path, DOCKER_COMPOSE)
+        data = safe_dump(compose).encode('utf-8')
+        try:
+            with open(compose_path, 'rb') as f:
+                current = f.read()
+        except FileNotFoundError:
+            current = None
+        if current != data:
+            # Write alongside and rename, so docker never reads a half-written file
+            temp = None
+            try:
+                with NamedTemporaryFile(dir=app_path, prefix=DOCKER_COMPOSE, delete=False) as f:
+                    temp = f.name
+                    f.write(data)
+                # NamedTemporaryFile creates 0600; keep the usual mode of the generated file
+                chmod(temp, 0o644)
+                replace(temp, compose_path)
+            except Exception:
+                # don't leave stray temporaries in the app's work tree
+                if temp:
+                    remove(temp)
+                raise
         if caddy:
             caddy_config(app, caddy)
-        # Record chosen mode for subsequent lifecycle ops
-        mode = 'swarm' if docker_supports_swarm() else 'compose'
-        cfg_override = safe_load(open(compose_file, 'r', encoding='utf-8')) if exists(compose_file) else {}
-        if isinstance(cfg_override, dict) and cfg_override.get('x-kata-mode') in ('swarm', 'compose'):
-            mode = cfg_override['x-kata-mode']
+        # Record chosen mode for subsequent lifecycle ops (x-kata-mode survives parse_compose)
+        mode = compose.get('x-kata-mode')
+        if mode not in ('swarm', 'compose'):
+            mode = 'swarm' if docker_supports_swarm() else 'compose'
         set_app_mode(app, mode)
-        do_start(app)
+        do_start(app, mode)
     else:
         echo(f"Error: app '{app}' not found.", fg='red')
 
 
-def do_start(app):
+def do_start(app, mode=None):
     app_path = join(APP_ROOT, app)
-    if exists(join(app_path, DOCKER_COMPOSE)):
-        mode = get_app_mode(app)
+    compose_path = join(app_path, DOCKER_COMPOSE)
+    # do_deploy passes the mode it just recorded, so skip re-probing the filesystem
+    if mode or exists(compose_path):
+        mode = mode or get_app_mode(app)
         echo(f"-----> Starting app '{app}' (mode: {mode})", fg='yellow')
-        compose_path = join(app_path, DOCKER_COMPOSE)
         if mode == 'swarm':
-            call(['docker', 'stack', 'deploy', app, f'--compose-file={compose_path}', '--detach=true', '--resolve-image=never', '--prune'],
+            call([tool_path('docker'), 'stack', 'deploy', app, f'--compose-file={compose_path}', '--detach=true', '--resolve-image=never', '--prune'],
                  cwd=app_path, stdout=stdout, stderr=stderr, universal_newlines=True)
         else:
             # docker compose up -d
@@ -609,7 +774,7 @@ def do_stop(app):
         echo(f"-----> Stopping app '{app}' (mode: {mode})", fg='yellow')
         compose_path = join(app_path, DOCKER_COMPOSE)
         if mode == 'swarm':
-            call(['docker', 'stack', 'rm', app],
+            call([tool_path('docker'), 'stack', 'rm', app],
                  cwd=app_path, stdout=stdout, stderr=stderr, universal_newlines=True)
         else:
             call(get_compose_cmd() + ['-f', compose_path, 'down', '--remove-orphans'],
@@ -619,7 +784,7 @@ def do_stop(app):
 def do_remove(app):
     app_path = join(APP_ROOT, app)
     if exists(join(app_path, DOCKER_COMPOSE)):
-        yaml = safe_load(open(join(app_path, KATA_COMPOSE), 'r', encoding='utf-8').read())
+        yaml = load_cached(join(app_path, KATA_COMPOSE), read_yaml)
         if 'services' in yaml:
             for service_name, service in yaml['services'].items():
                 echo("---> Removing service: " + service_name, fg='yellow')
@@ -630,7 +795,7 @@ def do_remove(app):
         echo(f"-----> Removing '{app}' (mode: {mode})", fg='yellow')
         compose_path = join(app_path, DOCKER_COMPOSE)
         if mode == 'swarm':
-            call(['docker', 'stack', 'rm', app],
+            call([tool_path('docker'), 'stack', 'rm', app],
                  cwd=app_path, stdout=stdout, stderr=stderr, universal_newlines=True)
         else:
             call(get_compose_cmd() + ['-f', compose_path, 'down', '--volumes', '--remove-orphans'],
@@ -655,18 +820,19 @@ command = cli.command
 @command('ls')
 def cmd_apps():
     """List apps/stacks"""
-    apps = listdir(APP_ROOT)
+    with scandir(APP_ROOT) as entries:
+        apps = sorted(e.name for e in entries if e.is_dir())
     if not apps:
         return
 
-    containers = check_output(['docker', 'ps', '--format', '{{.Names}}'], universal_newlines=True).splitlines()
+    # One docker ps call, keyed on the project/stack labels compose and swarm set on every container
+    labels = check_output([tool_path('docker'), 'ps', '--format',
+                           '{{.Label "com.docker.compose.project"}}\t{{.Label "com.docker.stack.namespace"}}'],
+                          universal_newlines=True)
+    running = {name for line in labels.splitlines() for name in line.split('\t') if name}
     for a in apps:
-        running = False
-        for c in containers:
-            if c.startswith(a + '-'):
-                running = True
-                break
-        echo(('*' if running else ' ') + a, fg='green')
+        # compose lowercases project names
+        echo(('*' if a in running or a.lower() in running else ' ') + a, fg='green')
 
 
 @command('config:stack')
@@ -676,9 +842,10 @@ def cmd_config(app):
     app = exit_if_invalid(app)
 
     config_file = join(APP_ROOT, app, KATA_COMPOSE)
-    if exists(config_file):
-        echo(open(config_file).read().strip(), fg='white')
-    else:
+    try:
+        with open(config_file, 'r', encoding='utf-8') as f:
+            echo(f.read().strip(), fg='white')
+    except FileNotFoundError:
         echo(f"Warning: app '{app}' not deployed, no config found.", fg='yellow')
 
 
@@ -707,33 +874,23 @@ def cmd_secrets_set(secrets):
                 elif v.startswith('@'):
                     # Read from file
                     filename = v[1:]  # Remove the @ prefix
-                    if not exists(filename):
-                        echo(f"Error: File '{filename}' not found", fg='red')
-                        continue
                     try:
-                        # Try to read as text first, fall back to binary if needed
-                        try:
-                            with open(filename, 'r', encoding='utf-8') as f:
-                                content = f.read()
-                        except UnicodeDecodeError:
-                            # File contains binary data, read as bytes and decode
-                            with open(filename, 'rb') as f:
-                                content = f.read().decode('utf-8', errors='replace')
+                        # Read once as bytes; binary data is decoded with replacement characters
+                        with open(filename, 'rb') as f:
+                            content = f.read().decode('utf-8', errors='replace')
                         echo(f"Reading secret '{k}' from file '{filename}'", fg='green')
+                    except FileNotFoundError:
+                        echo(f"Error: File '{filename}' not found", fg='red')
+                        continue
                     except Exception as e:
                         echo(f"Error reading file '{filename}': {str(e)}", fg='red')
                         continue
                 elif exists(v):
                     # If value looks like a file path and the file exists, read from it
                     try:
-                        # Try to read as text first, fall back to binary if needed
-                        try:
-                            with open(v, 'r', encoding='utf-8') as f:
-                                content = f.read()
-                        except UnicodeDecodeError:
-                            # File contains binary data, read as bytes and decode
-                            with open(v, 'rb') as f:
-                                content = f.read().decode('utf-8', errors='replace')
+                        # Read once as bytes; binary data is decoded with replacement characters
+                        with open(v, 'rb') as f:
+                            content = f.read().decode('utf-8', errors='replace')
                         echo(f"Reading secret '{k}' from file '{v}'", fg='green')
                     except Exception as e:
                         echo(f"Error reading file '{v}': {str(e)}", fg='red')
@@ -748,7 +905,7 @@ def cmd_secrets_set(secrets):
                 content = stdin.read()
             
             echo(f"Setting secret '{k}'", fg='white')
-            run(['docker', 'secret', 'create', k, '-'], input=content,
+            run([tool_path('docker'), 'secret', 'create', k, '-'], input=content,
                  stdout=stdout, stderr=stderr, universal_newlines=True, text=True, check=True)
                  
         except ValueError:
@@ -765,7 +922,7 @@ def cmd_secrets_rm(secret):
     """Remove a secret"""
     if not require_swarm_or_warn():
         return
-    call(['docker', 'secret', 'rm', secret], stdout=stdout, stderr=stderr, universal_newlines=True)
+    call([tool_path('docker'), 'secret', 'rm', secret], stdout=stdout, stderr=stderr, universal_newlines=True)
 
 
 @command('secrets:ls')
@@ -773,7 +930,7 @@ def cmd_secrets_ls():
     """List docker secrets defined in host."""
     if not require_swarm_or_warn():
         return
-    call(['docker', 'secret', 'ls'], stdout=stdout, stderr=stderr, universal_newlines=True)
+    call([tool_path('docker'), 'secret', 'ls'], stdout=stdout, stderr=stderr, universal_newlines=True)
 
 
 @command('config:docker')
@@ -782,9 +939,10 @@ def cmd_config_live(app):
     """Show live config for running app"""
     app = exit_if_invalid(app)
     config_file = join(APP_ROOT, app, DOCKER_COMPOSE)
-    if exists(config_file):
-        echo(open(config_file).read().strip(), fg='white')
-    else:
+    try:
+        with open(config_file, 'r', encoding='utf-8') as f:
+            echo(f.read().strip(), fg='white')
+    except FileNotFoundError:
         echo(f"Warning: app '{app}' not deployed, no config found.", fg='yellow')
 
 
@@ -795,7 +953,7 @@ def cmd_caddy_app(app):
     app = exit_if_invalid(app)
     caddy_json = caddy_get(app)
     if caddy_json:
-        echo(dumps(caddy_json, indent=2), fg='white')
+        echo(json_encode(caddy_json, indent=True).decode('utf-8'), fg='white')
     else:
         echo(f"Warning: app '{app}' has no Caddy config.", fg='yellow')
 
@@ -806,6 +964,7 @@ def cmd_caddy_app(app):
 @option('--wipe',  '-w', is_flag=True, help='Delete data and config directories')
 def cmd_destroy(app, force, wipe):
     """Remove an app"""
+    from concurrent.futures import ThreadPoolExecutor
     app = sanitize_app_name(app)
     app_path = join(APP_ROOT, app)
     if not exists(app_path):
@@ -825,12 +984,17 @@ def cmd_destroy(app, force, wipe):
     if wipe:
         paths.extend([join(DATA_ROOT, app), join(CONFIG_ROOT, app)])
 
-    for path in paths:
-        if exists(path):
-            try:
-                rmtree(path)
-            except Exception as e:
-                echo(f"Error removing {path}: {str(e)}", fg='red')
+    def remove_tree(path):
+        try:
+            rmtree(path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            echo(f"Error removing {path}: {str(e)}", fg='red')
+
+    # The trees are independent and rmtree is bound by unlink latency, so remove them concurrently
+    with ThreadPoolExecutor(max_workers=len(paths)) as pool:
+        pool.map(remove_tree, paths)
     echo(f"-----> '{app}' destroyed", fg='green')
     if not wipe:
         echo("Data and config directories were not deleted. Use --wipe to remove them.", fg='yellow')
@@ -839,7 +1003,7 @@ def cmd_destroy(app, force, wipe):
 @argument('args', nargs=-1, required=True, type=UNPROCESSED)
 def cmd_ps(args):
     """Pass-through Docker commands (logs, etc.)"""
-    call(['docker'] + list(args),
+    call([tool_path('docker')] + list(args),
          stdout=stdout, stderr=stderr, universal_newlines=True)
 
 
@@ -847,7 +1011,7 @@ def cmd_ps(args):
 @argument('stack', required=True)
 def cmd_services(stack):
     """List services for a stack"""
-    call(['docker', 'stack', 'services', stack],
+    call([tool_path('docker'), 'stack', 'services', stack],
          stdout=stdout, stderr=stderr, universal_newlines=True)
 
 
@@ -855,7 +1019,7 @@ def cmd_services(stack):
 @argument('service', nargs=-1, required=True)
 def cmd_ps(service):
     """List processes for a service"""
-    call(['docker', 'service', 'ps', service],
+    call([tool_path('docker'), 'service', 'ps', service],
          stdout=stdout, stderr=stderr, universal_newlines=True)
 
 
@@ -864,8 +1028,8 @@ def cmd_ps(service):
 @argument('command', nargs=-1, required=True)
 def cmd_run(service, command):
     """Run a command inside a service"""
-    call(['docker', 'exec', '-ti', service] + list(command),
-         stdout=stdout, stderr=stderr, universal_newlines=True)
+    # Nothing runs after this, so let docker take over our process and terminal
+    execvp(tool_path('docker'), [tool_path('docker'), 'exec', '-ti', service, *command])
 
 
 @command('restart')
@@ -912,11 +1076,12 @@ def cmd_stop(app):
 @command('setup')
 def cmd_setup():
     """Setup the local kata environment"""
-    for f in ROOT_FOLDERS:
-        d = globals()[f]
-        if not exists(d):
+    for _, d in ROOT_PATHS:
+        try:
             makedirs(d)
             echo(f"Created {d}", fg='green')
+        except FileExistsError:
+            pass
     echo("Kata setup complete", fg='green')
 
 
@@ -924,11 +1089,21 @@ def cmd_setup():
 @argument('public_key_file')
 def cmd_setup_ssh(public_key_file):
     """Set up a new SSH key (use - for stdin)"""
+    from base64 import b64decode, b64encode
+    from hashlib import sha256
+    from tempfile import NamedTemporaryFile
+    from traceback import format_exc
     def add_helper(key_file):
         if exists(key_file):
             try:
-                fingerprint = str(check_output('ssh-keygen -lf ' + key_file, shell=True)).split(' ', 4)[1]
-                key = open(key_file, 'r').read().strip()
+                with open(key_file, 'r', encoding='utf-8') as f:
+                    key = f.read().strip()
+                # Same SHA256 fingerprint 'ssh-keygen -lf' prints, without forking it
+                key_type, blob = key.split()[:2]
+                blob = b64decode(blob, validate=True)
+                if blob[4:4 + int.from_bytes(blob[:4], 'big')] != key_type.encode('ascii'):
+                    raise ValueError(f"key data does not match type '{key_type}'")
+                fingerprint = 'SHA256:' + b64encode(sha256(blob).digest()).decode('ascii').rstrip('=')
                 echo("Adding key '{}'.".format(fingerprint), fg='white')
                 setup_authorized_keys(fingerprint, KATA_SCRIPT, key)
             except Exception:
@@ -948,29 +1123,34 @@ def cmd_setup_ssh(public_key_file):
 @command('update')
 def cmd_update():
     """Update kata to the latest version"""
+    from shutil import copyfileobj
+    from tempfile import NamedTemporaryFile
+    from urllib.error import HTTPError
+    from urllib.request import urlopen
+    download = None
     try:
-        # Download the latest version
+        # Stream the latest version next to the script, so it can be swapped in with one atomic rename
         echo("Downloading latest version...", fg='green')
-        response = HTTPSConnection('raw.githubusercontent.com').request('GET', KATA_RAW_SOURCE_URL)
-
-        if response.status_code == 200:
-            # Create a backup of the current script
-            backup_file = f"{KATA_SCRIPT}.backup"
-            copyfile(KATA_SCRIPT, backup_file)
-            echo(f"Created backup at {backup_file}", fg='green')
-            # Write the new version
-            with open(KATA_SCRIPT, 'w', encoding='utf-8') as f:
-                f.write(response.text)
-            # Make it executable
-            chmod(KATA_SCRIPT, S_IRUSR | S_IWUSR | S_IXUSR)
-            echo("Update complete! Restart any running kata processes.", fg='green')
-        else:
-            echo(f"Failed to download update: HTTP {response.status_code}", fg='red')
-    except ImportError:
-        echo("Error: requests module not installed", fg='red')
-        echo("Install it with: pip install requests", fg='yellow')
+        with urlopen(KATA_RAW_SOURCE_URL, timeout=30) as response, \
+             NamedTemporaryFile(dir=dirname(KATA_SCRIPT), prefix='.kata-', suffix='.py', delete=False) as f:
+            download = f.name
+            copyfileobj(response, f, 64 * 1024)
+        # Create a backup of the current script
+        backup_file = f"{KATA_SCRIPT}.backup"
+        copyfile(KATA_SCRIPT, backup_file)
+        echo(f"Created backup at {backup_file}", fg='green')
+        # Make it executable and put it in place
+        chmod(download, S_IRUSR | S_IWUSR | S_IXUSR)
+        replace(download, KATA_SCRIPT)
+        download = None
+        echo("Update complete! Restart any running kata processes.", fg='green')
+    except HTTPError as e:
+        echo(f"Failed to download update: HTTP {e.code}", fg='red')
     except Exception as e:
         echo(f"Error updating kata: {str(e)}", fg='red')
+    finally:
+        if download:
+            remove(download)
 
 # === Internal commands ===
 
@@ -983,15 +1163,22 @@ def cmd_git_hook(app):
     app_path = join(APP_ROOT, app)
     data_path = join(DATA_ROOT, app)
 
+    # A push can update several refs at once, but they all deploy into the same
+    # work tree, so only the last revision matters - deploy once with it.
+    # Ref deletions arrive with an all-zero newrev and have nothing to deploy.
+    newrev = None
     for line in stdin:
-        oldrev, newrev, refname = line.strip().split(" ")
-        if not exists(app_path):
-            echo("-----> Creating app '{}'".format(app), fg='green')
-            makedirs(app_path)
-            if not exists(data_path):
-                makedirs(data_path)
-            call("git clone --quiet {} {}".format(repo_path, app), cwd=APP_ROOT, shell=True)
-        do_deploy(app, newrev=newrev)
+        oldrev, rev, refname = line.strip().split(" ")
+        if rev.strip('0'):
+            newrev = rev
+    if newrev is None:
+        return
+    if not exists(app_path):
+        echo("-----> Creating app '{}'".format(app), fg='green')
+        makedirs(app_path)
+        makedirs(data_path, exist_ok=True)
+        call([tool_path('git'), 'clone', '--quiet', repo_path, app], cwd=APP_ROOT)
+    do_deploy(app, newrev=newrev)
 
 
 @command("git-receive-pack", hidden=True)
@@ -1000,21 +1187,29 @@ def cmd_git_receive_pack(app):
     # INTERNAL: Handle git pushes for an app
     app = sanitize_app_name(app)
     hook_path = join(GIT_ROOT, app, 'hooks', 'post-receive')
-    env = globals()
-    env.update(locals())
-
-    if not exists(hook_path):
-        makedirs(dirname(hook_path))
+    hook = POST_RECEIVE_HOOK.format(KATA_ROOT=KATA_ROOT, KATA_SCRIPT=KATA_SCRIPT, app=app).encode('utf-8')
+    try:
+        with open(hook_path, 'rb') as h:
+            current = h.read()
+            executable = fstat(h.fileno()).st_mode & S_IXUSR
+    except FileNotFoundError:
+        current, executable = None, False
+        makedirs(dirname(hook_path), exist_ok=True)
         # Initialize the repository with a hook to this script
-        call("git init --quiet --bare " + app, cwd=GIT_ROOT, shell=True)
-        with open(hook_path, 'w', encoding='utf-8') as h:
-            h.write("""#!/usr/bin/env bash
-set -e; set -o pipefail;
-cat | KATA_ROOT="{KATA_ROOT:s}" {KATA_SCRIPT:s} git-hook {app:s}""".format(**env))
-        # Make the hook executable by our user
-        chmod(hook_path, stat(hook_path).st_mode | S_IXUSR)
+        call([tool_path('git'), 'init', '--quiet', '--bare', app], cwd=GIT_ROOT)
+    # Only rewrite the hook when it is missing, out of date or not executable (git skips those silently)
+    if current != hook or not executable:
+        fd = os_open(hook_path, O_WRONLY | O_CREAT | O_TRUNC, 0o755)
+        try:
+            os_write(fd, hook)
+            # the mode given to os_open only applies on creation
+            fchmod(fd, 0o755)
+        finally:
+            close(fd)
     # Handle the actual receive. We'll be called with 'git-hook' after it happens
-    call('git-shell -c "{}" '.format(argv[1] + " '{}'".format(app)), cwd=GIT_ROOT, shell=True)
+    # Nothing runs after this, so git replaces our process instead of forking
+    chdir(GIT_ROOT)
+    execvp('git-receive-pack', ['git-receive-pack', app])
 
 
 @command("git-upload-pack", hidden=True)
@@ -1022,17 +1217,18 @@ cat | KATA_ROOT="{KATA_ROOT:s}" {KATA_SCRIPT:s} git-hook {app:s}""".format(**env
 def cmd_git_upload_pack(app):
     # INTERNAL: Handle git upload pack for an app
     app = sanitize_app_name(app)
-    env = globals()
-    env.update(locals())
-    # Handle the actual receive. We'll be called with 'git-hook' after it happens
-    call('git-shell -c "{}" '.format(argv[1] + " '{}'".format(app)), cwd=GIT_ROOT, shell=True)
+    # Nothing runs after this, so git replaces our process instead of forking
+    chdir(GIT_ROOT)
+    execvp('git-upload-pack', ['git-upload-pack', app])
 
 
 @command("scp", context_settings=dict(ignore_unknown_options=True))
 @argument('args', nargs=-1, required=True, type=UNPROCESSED)
 def cmd_scp(args):
     """Copy files to/from the server"""
-    call(["scp"] + list(args), cwd=abspath(environ['HOME']))
+    # scp is a terminal action, so let it replace our process
+    chdir(abspath(environ['HOME']))
+    execvp('scp', ['scp', *args])
 
 
 # Helper to print CLI help
@@ -1049,6 +1245,13 @@ def cmd_help():
     show_help()
 
 
+# Internal commands invoked on every git push/fetch, dispatched without click
+FAST_COMMANDS = {c.name: c.callback for c in (cmd_git_hook, cmd_git_receive_pack, cmd_git_upload_pack)}
+
+
 if __name__ == '__main__':
-    # Run the CLI with all registered commands
-    cli()
+    if len(argv) == 3 and argv[1] in FAST_COMMANDS:
+        FAST_COMMANDS[argv[1]](argv[2])
+    else:
+        # Run the CLI with all registered commands
+        cli()
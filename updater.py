@@ -3,31 +3,64 @@
 # and updates kata.py on the server side. This is meant for development purposes only.
 # It is not secure and should not be used in production.
 
-from os import chmod, chdir, environ
-from http.server import SimpleHTTPRequestHandler
-from socketserver import TCPServer
-from logging import basicConfig, INFO, info
+from os import chmod, chdir, environ, remove, replace
+from hmac import compare_digest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from tempfile import NamedTemporaryFile
+from logging import basicConfig, INFO, info, warning
     
 basicConfig(level=INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-class MyRequestHandler(SimpleHTTPRequestHandler):
+# Shared secret clients must send in an X-Auth header, and the largest upload we accept
+SECRET = environ.get('UPDATER_SECRET', '')
+MAX_BYTES = int(environ.get('UPDATER_MAX_BYTES', 1024 * 1024))
+
+# BaseHTTPRequestHandler answers anything but POST with 501, so nothing under $HOME is ever served
+class MyRequestHandler(BaseHTTPRequestHandler):
     def do_POST(self):
-        content_length = int(self.headers['Content-Length'])
-        post_data = self.rfile.read(content_length)
+        # Reject before reading any of the body
+        if not compare_digest(self.headers.get('X-Auth', '').encode('utf-8'), SECRET.encode('utf-8')):
+            warning(f"Rejected POST from {self.client_address[0]}: bad X-Auth header.")
+            self.send_error(403)
+            return
+        try:
+            content_length = int(self.headers['Content-Length'])
+        except (TypeError, ValueError):
+            self.send_error(411)
+            return
+        if not 0 < content_length <= MAX_BYTES:
+            warning(f"Rejected POST with {content_length} bytes of data.")
+            self.send_error(413)
+            return
         info(f"Received POST request with {content_length} bytes of data.")
 
-        with open('kata.py', 'wb') as f:
-            f.write(post_data)
-            info("Updated kata.py with new content.")
-        chmod('kata.py', 0o755)
+        # Stream the body to a temporary file alongside kata.py and rename it into place
+        with NamedTemporaryFile(dir='.', prefix='.kata-', suffix='.py', delete=False) as f:
+            try:
+                remaining = content_length
+                while remaining > 0:
+                    chunk = self.rfile.read(min(remaining, 64 * 1024))
+                    if not chunk:
+                        raise ConnectionError(f"body ended {remaining} bytes short")
+                    f.write(chunk)
+                    remaining -= len(chunk)
+            except Exception:
+                f.close()
+                remove(f.name)
+                raise
+        chmod(f.name, 0o755)
+        replace(f.name, 'kata.py')
+        info("Updated kata.py with new content.")
         self.send_response(200)
         self.send_header('Content-type', 'text/plain')
         self.end_headers()
         self.wfile.write("OK".encode('utf-8'))
 
 if __name__ == "__main__":
+    if not SECRET:
+        exit("Set UPDATER_SECRET to the shared secret clients send in X-Auth")
     chdir(environ.get("HOME"))
-    with TCPServer(("", 8000), MyRequestHandler) as httpd:
+    with ThreadingHTTPServer(("", 8000), MyRequestHandler) as httpd:
         info(f"Serving on port {httpd.server_address[1]}")
         httpd.serve_forever()
 